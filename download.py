@@ -1,11 +1,18 @@
 import os
+import re
 import sys
-import json
+import asyncio
+import hashlib
+import threading
 import requests
-from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import aiohttp
+import ijson
+import orjson
 from tqdm import tqdm
-from bs4 import BeautifulSoup  # For parsing Fabric Maven repository
 import subprocess  # For running the Fabric installer JAR
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 # Constants
 VERSION_MANIFEST_URL = "https://launchermeta.mojang.com/mc/game/version_manifest.json"
@@ -14,93 +21,335 @@ APPDATA = os.getenv('APPDATA')
 BASE_PATH = os.path.join(APPDATA, "TuiCraft")
 LIBRARIES_PATH = os.path.join(BASE_PATH, "libraries")
 ASSETS_PATH = os.path.join(BASE_PATH, "assets")
+CHUNK_SIZE = 1 << 18  # 256 KiB per read from the response body
+MAX_CONCURRENT_DOWNLOADS = int(os.getenv("TUICRAFT_DL_WORKERS", "64"))
+FABRIC_VERSION_RE = re.compile(rb'href="(\d+(?:\.\d+)*)/"')  # Version folders in the Maven listing
+WARMUP_REQUESTS = 32  # HEAD requests sent to open pooled connections before a large batch
+HASH_WORKERS = min(32, (os.cpu_count() or 1) + 4)  # Threads hashing files at once
+OPEN_FLAGS = os.O_CREAT | os.O_WRONLY | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+# Shared HTTP session so metadata requests reuse pooled keep-alive connections
+SESSION = requests.Session()
+SESSION.mount(
+    "https://",
+    HTTPAdapter(pool_connections=64, pool_maxsize=64, max_retries=Retry(total=3, backoff_factor=0.2)),
+)
+
+# Per-thread read buffer for hashing downloaded files
+_hash_buffers = threading.local()
+# One hashing pool for every check instead of a new one per call
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS)
+_cache_write_lock = threading.Lock()
 
 # Ensure directories exist
 os.makedirs(LIBRARIES_PATH, exist_ok=True)
 os.makedirs(ASSETS_PATH, exist_ok=True)
 
 
-def download_file(url, save_path):
-    """Function to download a file with progress."""
-    if os.path.exists(save_path):
-        return
+async def download_file(session, url, save_path, log=print):
+    """Function to download a file."""
     try:
-        with requests.get(url, stream=True, timeout=10) as response:
+        async with session.get(url) as response:
             response.raise_for_status()
-            total_size = int(response.headers.get('content-length', 0))
-            with open(save_path, "wb") as file, tqdm(
-                desc=f"Downloading {os.path.basename(save_path)}",
-                total=total_size,
-                unit="B",
-                unit_scale=True,
-                unit_divisor=1024,
-            ) as bar:
-                for chunk in response.iter_content(chunk_size=8192):
-                    file.write(chunk)
-                    bar.update(len(chunk))
-        print(f"Downloaded: {save_path}")
+            await write_response(response, save_path)
+        log(f"Downloaded: {save_path}")
     except Exception as e:
-        print(f"Failed to download {url}: {e}")
+        log(f"Failed to download {url}: {e}")
+        # A preallocated partial file would look complete on the next run
+        try:
+            os.remove(save_path)
+        except FileNotFoundError:
+            pass
+
+
+def preallocate(fd, size):
+    """Reserve the full size of a file up front."""
+    try:
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, size)
+        else:
+            os.ftruncate(fd, size)
+    except OSError:
+        pass  # Not supported by this filesystem; the file simply grows as it is written
+
+
+def write_all(fd, data):
+    """Write a whole chunk to a file descriptor."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def write_file(save_path, data):
+    """Write a whole body to disk with a single open, write and close."""
+    fd = os.open(save_path, OPEN_FLAGS, 0o644)
+    try:
+        write_all(fd, data)
+    finally:
+        os.close(fd)
+
+
+def cached_version_url(manifest_path, version_id):
+    """Look up a version's JSON URL in the cached manifest, if there is one."""
+    try:
+        with open(manifest_path, "rb") as file:
+            manifest = orjson.loads(file.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+    for version in manifest.get("versions", []):
+        if version["id"] == version_id:
+            return version["url"]
+    return None
+
+
+def save_in_background(*files):
+    """Write (path, data) cache files in order on a separate thread, off the critical path."""
+    def save():
+        # Concurrent saves of the same cache must not interleave their writes
+        with _cache_write_lock:
+            for save_path, data in files:
+                write_file(save_path, data)
+
+    threading.Thread(target=save).start()
+
+
+def fetch_cached(url, cache_path):
+    """Fetch a URL, revalidating the cached copy with ETag / Last-Modified.
+
+    Returns the body, or None if the server did not answer with the content.
+    """
+    validators_path = f"{cache_path}.validators"
+    headers = {}
+    if os.path.exists(cache_path) and os.path.exists(validators_path):
+        with open(validators_path, "rb") as file:
+            validators = orjson.loads(file.read())
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    response = SESSION.get(url, headers=headers, timeout=10)
+    if response.status_code == 304:
+        with open(cache_path, "rb") as file:
+            return file.read()
+    if response.status_code != 200:
+        return None
+
+    validators = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Drop the old validators and write the new ones last, so they never describe a half-written cache
+    if os.path.exists(validators_path):
+        os.remove(validators_path)
+    save_in_background((cache_path, response.content), (validators_path, orjson.dumps(validators)))
+    return response.content
+
+
+async def write_response(response, save_path):
+    """Stream a response body straight to disk, bypassing Python's buffered file layer."""
+    total_size = response.content_length
+    if total_size is not None and total_size <= CHUNK_SIZE:
+        # Most assets are tiny: buffer them whole and write them in one worker call
+        await asyncio.to_thread(write_file, save_path, await response.read())
+        return
+
+    fd = os.open(save_path, OPEN_FLAGS, 0o644)
+    try:
+        if total_size:
+            preallocate(fd, total_size)
+        written = 0
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            await asyncio.to_thread(write_all, fd, chunk)
+            written += len(chunk)
+        if total_size and written != total_size:
+            os.ftruncate(fd, written)  # Decoded body differs from the announced length
+    finally:
+        os.close(fd)
 
 
 def organize_file_path(base_path, file_path):
     """Function to organize file paths."""
     parts = file_path.replace("\\", "/").split("/")
     sub_path = os.path.join(base_path, *parts[:-1])  # Exclude the filename
-    os.makedirs(sub_path, exist_ok=True)
     return os.path.join(sub_path, parts[-1])  # Full path including the file name
 
 
-def download_files_parallel(file_list):
-    """Function to download files in parallel."""
-    with ThreadPoolExecutor() as executor:
-        list(tqdm(executor.map(lambda file: download_file(*file), file_list), total=len(file_list)))
+def folder_listings(paths):
+    """Map the folder of each path to the names it holds, listing each folder only once."""
+    existing = {}
+    for path in paths:
+        directory = os.path.dirname(path)
+        if directory not in existing:
+            try:
+                with os.scandir(directory) as entries:
+                    existing[directory] = {entry.name for entry in entries}
+            except FileNotFoundError:
+                existing[directory] = set()
+    return existing
+
+
+def is_listed(existing, path):
+    """Return whether path was found by folder_listings."""
+    directory, name = os.path.split(path)
+    return name in existing[directory]
+
+
+def missing_files(file_list):
+    """Drop files that already exist."""
+    existing = folder_listings(save_path for _, save_path in file_list)
+    return [(url, save_path) for url, save_path in file_list if not is_listed(existing, save_path)]
+
+
+def sha1_file(path):
+    """Return the SHA-1 hex digest of a file, or None if it does not exist."""
+    view = getattr(_hash_buffers, "view", None)
+    if view is None:
+        view = _hash_buffers.view = memoryview(bytearray(1 << 20))
+    digest = hashlib.sha1()
+    try:
+        with open(path, "rb", buffering=0) as file:
+            while size := file.readinto(view):
+                digest.update(view[:size])
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def remove_corrupt_files(expected_hashes, log=print):
+    """Delete files whose SHA-1 does not match so they are downloaded again."""
+    # Only hash files that are there; on a fresh install that skips every open
+    existing = folder_listings(expected_hashes)
+    present = [save_path for save_path in expected_hashes if is_listed(existing, save_path)]
+
+    # hashlib releases the GIL while hashing, so the files are checked in parallel.
+    # Only a small window is queued at a time: pool threads finish their queue at
+    # interpreter exit, and quitting should not wait for thousands of hashes
+    paths = iter(present)
+    pending = {}
+    try:
+        while True:
+            while len(pending) < 2 * HASH_WORKERS and (save_path := next(paths, None)) is not None:
+                pending[_hash_executor.submit(sha1_file, save_path)] = save_path
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                save_path = pending.pop(future)
+                digest = future.result()
+                if digest is not None and digest != expected_hashes[save_path]:
+                    log(f"Corrupt file, downloading again: {save_path}")
+                    # The file can be locked, or already replaced by another install sharing the store
+                    try:
+                        os.remove(save_path)
+                    except OSError as e:
+                        log(f"Could not remove {save_path}: {e}")
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def create_client_session():
+    """Create the aiohttp session shared by every download of a run."""
+    # Nearly every file comes from one host, so the per-host limit is the one that counts
+    connector = aiohttp.TCPConnector(
+        limit=max(128, MAX_CONCURRENT_DOWNLOADS), limit_per_host=MAX_CONCURRENT_DOWNLOADS
+    )
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=10)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def warm_up(session, file_list):
+    """Open pooled connections ahead of a large batch with cheap HEAD requests."""
+    # One URL per folder on the server, e.g. one per asset hash prefix
+    sample = list({os.path.dirname(url): url for url, _ in file_list}.values())[:WARMUP_REQUESTS]
+    timeout = aiohttp.ClientTimeout(total=2)
+
+    async def head(url):
+        try:
+            async with session.head(url, timeout=timeout):
+                pass
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass  # Only a warm-up; the real download reports any failure
+
+    await asyncio.gather(*(head(url) for url in sample))
+
+
+async def download_all(session, file_list, log=print):
+    """Function to download files concurrently on a single event loop."""
+    file_list = missing_files(file_list)
+    if len(file_list) > WARMUP_REQUESTS:
+        await warm_up(session, file_list)
+    sem = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+
+    # One progress bar for the whole batch rather than one per file
+    with tqdm(total=len(file_list), unit="file") as progress:
+
+        async def bounded_download(url, save_path):
+            async with sem:
+                await download_file(session, url, save_path, log)
+            progress.update(1)
+
+        async with asyncio.TaskGroup() as group:
+            for url, save_path in file_list:
+                group.create_task(bounded_download(url, save_path))
+
+
+async def download_with_session(file_list, log=print):
+    """Download files using a session of their own."""
+    async with create_client_session() as session:
+        await download_all(session, file_list, log)
 
 
 def get_latest_fabric_installer_url():
     """Fetch the latest Fabric installer JAR URL."""
     try:
-        response = requests.get(FABRIC_INSTALLER_URL)
+        response = SESSION.get(FABRIC_INSTALLER_URL, timeout=10)
         response.raise_for_status()
 
-        # Parse the HTML to find the latest version directory
-        soup = BeautifulSoup(response.text, "html.parser")
-        links = [a["href"].strip("/") for a in soup.find_all("a", href=True)]
-        
-        # Assume directories with version numbers are valid
-        versions = [link for link in links if link.replace(".", "").isdigit()]
+        # Directories with version numbers are the installer releases
+        versions = FABRIC_VERSION_RE.findall(response.content)
         if not versions:
             raise Exception("No valid Fabric versions found.")
 
-        latest_version = sorted(versions, reverse=True)[0]
+        # Compare numerically so that 1.10.0 sorts after 1.9.0
+        latest_version = max(versions, key=lambda v: tuple(map(int, v.split(b".")))).decode()
         fabric_installer_url = f"{FABRIC_INSTALLER_URL}{latest_version}/fabric-installer-{latest_version}.jar"
         return fabric_installer_url
     except Exception as e:
         raise Exception(f"Failed to determine the latest Fabric installer URL: {e}")
 
 
-def get_fabric_installer(save_path):
+def get_fabric_installer(save_path, log=print):
     """Download the latest Fabric installer JAR if it doesn't already exist."""  
     try:
         if os.path.exists(save_path):
-            print(f"Fabric installer already exists: {save_path}")
+            log(f"Fabric installer already exists: {save_path}")
             return  # Skip download if the file already exists
         else:
             fabric_installer_url = get_latest_fabric_installer_url()
-            download_file(fabric_installer_url, save_path)
-            print(f"Fabric installer downloaded: {save_path}\n")
+            asyncio.run(download_with_session([(fabric_installer_url, save_path)], log))
+            log(f"Fabric installer downloaded: {save_path}\n")
     except Exception as e:
-        print(f"Failed to download Fabric installer: {e}\n")
+        log(f"Failed to download Fabric installer: {e}\n")
 
 
-def open_fabric_installer(save_path):
-    """Open the Fabric installer JAR."""
+def open_fabric_installer(save_path, log=print):
+    """Open the Fabric installer JAR and wait for it to close. Returns whether it ran."""
     try:
         subprocess.run(["java", "-jar", save_path], check=True)
-    except FileNotFoundError:
-        return
+        return True
     except Exception as e:
-        return
+        log(f"Could not run the Fabric installer: {e}")
+        return False
+
+
+def install_fabric(log=print):
+    """Download the Fabric installer if needed and run it."""
+    fabric_installer_path = os.path.join(BASE_PATH, "fabric-installer.jar")
+    get_fabric_installer(fabric_installer_path, log)
+    return open_fabric_installer(fabric_installer_path, log)
 
 
 def main():
@@ -112,86 +361,122 @@ def main():
     option = sys.argv[1].lower()
 
     if option == "fabric":
-        # Download Fabric installer
-        fabric_installer_path = os.path.join(BASE_PATH, "fabric-installer.jar")
-        get_fabric_installer(fabric_installer_path)
-        open_fabric_installer(fabric_installer_path)
+        # Download and run the Fabric installer
+        install_fabric()
         sys.exit(0)
 
     # If not Fabric, assume it's a Minecraft version
-    version_id = option
+    if not asyncio.run(install_version(option)):
+        sys.exit(1)
 
-    # Step 2: Download the version manifest
-    manifest_path = os.path.join(BASE_PATH, "version_manifest.json")
-    response = requests.get(VERSION_MANIFEST_URL)
-    if response.status_code == 200:
-        with open(manifest_path, "wb") as file:
-            file.write(response.content)
-    else:
-        raise Exception("Failed to download version manifest")
 
-    # Step 3: Parse the version manifest
-    with open(manifest_path, "r") as file:
-        data = json.load(file)
+async def install_version(version_id, log=print):
+    """Download the client, libraries and assets of a Minecraft version.
 
-    versions = {version["id"]: version["url"] for version in data.get("versions", [])}
+    Progress is reported through ``log``. Returns False if the version does not exist.
+    """
+    async with create_client_session() as session:
+        # Step 2: Download the version manifest
+        manifest_path = os.path.join(BASE_PATH, "version_manifest.json")
+        version_libraries_path = os.path.join(LIBRARIES_PATH, version_id)
+        version_json_path = os.path.join(version_libraries_path, f"{version_id}.json")
 
-    if version_id not in versions:
-        print(f"Version {version_id} not found in manifest. Exiting.")
-        sys.exit(1)
+        # If an earlier run cached the manifest, fetch the version JSON while the manifest is revalidated
+        guessed_url = cached_version_url(manifest_path, version_id)
+        fetches = [asyncio.to_thread(fetch_cached, VERSION_MANIFEST_URL, manifest_path)]
+        if guessed_url is not None:
+            fetches.append(asyncio.to_thread(fetch_cached, guessed_url, version_json_path))
+        manifest, *speculative = await asyncio.gather(*fetches)
+        if manifest is None:
+            raise Exception("Failed to download version manifest")
 
-    version_url = versions[version_id]
-    response = requests.get(version_url)
-    if response.status_code == 200:
-        version_data = response.json()
-        print(f"Version data for {version_id} retrieved.")
-    else:
-        raise Exception("Failed to retrieve version data")
-
-    # Step 4: Download the Minecraft JAR
-    client_url = version_data["downloads"]["client"]["url"]
-    version_libraries_path = os.path.join(LIBRARIES_PATH, version_id)
-    client_path = os.path.join(version_libraries_path, f"{version_id}.jar")
-    os.makedirs(version_libraries_path, exist_ok=True)
-    download_file(client_url, client_path)
-
-    # Step 5: Download libraries
-    libraries = version_data.get("libraries", [])
-    library_files = []
-    for library in libraries:
-        downloads = library.get("downloads", {})
-        artifact = downloads.get("artifact", {})
-        if artifact:
-            library_url = artifact["url"]
-            path_parts = artifact["path"].split("/")
-            library_path = organize_file_path(version_libraries_path, "/".join(path_parts))
-            library_files.append((library_url, library_path))
-
-    print("Downloading libraries...")
-    download_files_parallel(library_files)
-
-    # Step 6: Download assets
-    version_assets_path = os.path.join(ASSETS_PATH, version_id)
-    asset_index_url = version_data["assetIndex"]["url"]
-    asset_index_path = os.path.join(version_assets_path, "indexes", f"{version_id}.json")
-    os.makedirs(os.path.dirname(asset_index_path), exist_ok=True)
-    download_file(asset_index_url, asset_index_path)
-
-    with open(asset_index_path, "r") as file:
-        assets_data = json.load(file)
-
-    asset_files = []
-    for asset_name, asset_info in assets_data["objects"].items():
-        hash_value = asset_info["hash"]
-        subdir = hash_value[:2]
-        asset_url = f"https://resources.download.minecraft.net/{subdir}/{hash_value}"
-        asset_path = os.path.join(version_assets_path, "objects", subdir, hash_value)
-        os.makedirs(os.path.dirname(asset_path), exist_ok=True)
-        asset_files.append((asset_url, asset_path))
-
-    print("Downloading assets...")
-    download_files_parallel(asset_files)
-    print(f"All files for version {version_id} have been downloaded!")
+        # Step 3: Parse the version manifest
+        data = orjson.loads(manifest)
+
+        versions = {version["id"]: version["url"] for version in data.get("versions", [])}
+
+        if version_id not in versions:
+            log(f"Version {version_id} not found in manifest. Exiting.")
+            return False
+
+        version_url = versions[version_id]
+        if version_url == guessed_url:
+            version_json = speculative[0]
+        else:
+            version_json = fetch_cached(version_url, version_json_path)
+        if version_json is not None:
+            version_data = orjson.loads(version_json)
+            log(f"Version data for {version_id} retrieved.")
+        else:
+            raise Exception("Failed to retrieve version data")
+
+        # Step 4: Download the Minecraft JAR
+        client_url = version_data["downloads"]["client"]["url"]
+        client_path = os.path.join(version_libraries_path, f"{version_id}.jar")
+        # A preallocated JAR left by a killed run has full size but no data, so check its hash
+        remove_corrupt_files({client_path: version_data["downloads"]["client"]["sha1"]}, log)
+        await download_all(session, [(client_url, client_path)], log)
+
+        # Step 5: Download libraries
+        libraries = version_data.get("libraries", [])
+        library_files = []
+        library_hashes = {}
+        for library in libraries:
+            downloads = library.get("downloads", {})
+            artifact = downloads.get("artifact", {})
+            if artifact:
+                library_url = artifact["url"]
+                library_path = organize_file_path(version_libraries_path, artifact["path"])
+                library_files.append((library_url, library_path))
+                if "sha1" in artifact:
+                    library_hashes[library_path] = artifact["sha1"]
+
+        # Create each library folder once instead of once per file
+        for directory in {os.path.dirname(path) for _, path in library_files}:
+            os.makedirs(directory, exist_ok=True)
+
+        remove_corrupt_files(library_hashes, log)
+        log("Downloading libraries...")
+        await download_all(session, library_files, log)
+
+        # Record the exact classpath so launching does not have to scan the folder for JARs
+        with open(os.path.join(version_libraries_path, "classpath.txt"), "w", encoding="utf-8") as file:
+            file.write("\n".join([client_path] + [path for _, path in library_files]))
+
+        # Step 6: Download assets
+        # Objects live in one store shared by every version; only the index is per version
+        asset_index_url = version_data["assetIndex"]["url"]
+        asset_index_path = os.path.join(ASSETS_PATH, "indexes", f"{version_id}.json")
+        os.makedirs(os.path.dirname(asset_index_path), exist_ok=True)
+        # The index is fixed per version, so a present copy is reused unless its SHA-1 changed
+        remove_corrupt_files({asset_index_path: version_data["assetIndex"]["sha1"]}, log)
+        await download_all(session, [(asset_index_url, asset_index_path)], log)
+
+        # Stream the index so only the hashes are kept, not the whole parsed document.
+        # Several asset names can share one object, so keep each hash once
+        with open(asset_index_path, "rb") as file:
+            hashes = list(dict.fromkeys(asset_info["hash"] for _, asset_info in ijson.kvitems(file, "objects")))
+
+        objects_path = os.path.join(ASSETS_PATH, "objects")
+
+        # At most 256 hash prefix folders, so create them once up front
+        for subdir in {hash_value[:2] for hash_value in hashes}:
+            os.makedirs(os.path.join(objects_path, subdir), exist_ok=True)
+
+        asset_files = [
+            (
+                f"https://resources.download.minecraft.net/{hash_value[:2]}/{hash_value}",
+                os.path.join(objects_path, hash_value[:2], hash_value),
+            )
+            for hash_value in hashes
+        ]
+
+        # Asset objects are named after their own SHA-1
+        remove_corrupt_files({path: os.path.basename(path) for _, path in asset_files}, log)
+        log("Downloading assets...")
+        await download_all(session, asset_files, log)
+        log(f"All files for version {version_id} have been downloaded!")
+        return True
 
 
 if __name__ == "__main__":
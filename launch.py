@@ -3,7 +3,14 @@ import subprocess
 from pathlib import Path
 import argparse
 
-def launch_minecraft(
+def forward_output(stream, log, prefix=""):
+    """Pass each line of a child process stream to `log` as soon as it is written."""
+    for line in iter(stream.readline, ""):
+        log(prefix + line.rstrip())
+    stream.close()
+
+
+def build_launch_command(
     java_path,
     base_dir,
     libraries_dir,
@@ -13,7 +20,7 @@ def launch_minecraft(
     access_token="OFFLINE_ACCESS_TOKEN",
 ):
     """
-    Launch Minecraft in offline mode (non-demo) using LWJGL and additional dependencies.
+    Build the command and environment that launch Minecraft in offline mode (non-demo).
 
     Args:
         java_path (str): Path to the Java executable.
@@ -21,13 +28,22 @@ def launch_minecraft(
         libraries_dir (str): Path to the folder containing additional JAR files.
         version (str): Minecraft version to launch.
         username (str): The player's username (default: "User"). Requires Implementation for custom username.
+
+    Returns:
+        tuple[list[str], dict]: The full command line and the environment to run it with.
     """
     # Resolve paths
     base_dir = Path(base_dir).resolve()
     libraries_dir = Path(libraries_dir).resolve()
     version_dir = libraries_dir / version
     minecraft_dir = base_dir / "instances" / version / ".minecraft"
-    assets_dir = base_dir / "assets" / version
+    assets_dir = base_dir / "assets"
+
+    # Versions downloaded before the shared object store keep their own assets folder
+    if not (assets_dir / "indexes" / f"{version}.json").exists():
+        legacy_assets_dir = assets_dir / version
+        if legacy_assets_dir.exists():
+            assets_dir = legacy_assets_dir
 
     # Ensure the instance and assets directories exist
     os.makedirs(minecraft_dir, exist_ok=True)
@@ -42,8 +58,12 @@ def launch_minecraft(
     if not client_jar_path.exists():
         raise FileNotFoundError(f"Client JAR not found in version folder: {client_jar_path}")
 
-    # Collect all JAR files from the version's subdirectory
-    jar_files = [str(jar) for jar in version_dir.rglob("*.jar")]
+    # Use the classpath recorded at download time; older installs fall back to collecting every JAR
+    classpath_file = version_dir / "classpath.txt"
+    if classpath_file.exists():
+        jar_files = classpath_file.read_text(encoding="utf-8").splitlines()
+    else:
+        jar_files = [str(jar) for jar in version_dir.rglob("*.jar")]
 
     # Java classpath
     classpath = os.pathsep.join(jar_files)
@@ -71,10 +91,41 @@ def launch_minecraft(
 
     # Combine Java and Minecraft arguments
     full_command = [java_path] + java_args + mc_args + ["--debug"]
-    print(full_command)
+
     # Set environment variables
     env = os.environ.copy()
     env["MINECRAFT_LAUNCHER"] = "PythonLauncher"
+    return full_command, env
+
+
+def launch_minecraft(
+    java_path,
+    base_dir,
+    libraries_dir,
+    version,
+    username="User",
+    uuid="00000000-0000-0000-0000-000000000000",
+    access_token="OFFLINE_ACCESS_TOKEN",
+    log=print,
+):
+    """
+    Launch Minecraft in offline mode (non-demo) using LWJGL and additional dependencies.
+
+    Args:
+        java_path (str): Path to the Java executable.
+        base_dir (str): Path to the base directory (where `assets` and game files are located).
+        libraries_dir (str): Path to the folder containing additional JAR files.
+        version (str): Minecraft version to launch.
+        username (str): The player's username (default: "User"). Requires Implementation for custom username.
+        log (callable): Receives each line of launcher and game output (default: print).
+
+    Returns:
+        int | None: The game's exit code, or None if it could not be started.
+    """
+    full_command, env = build_launch_command(
+        java_path, base_dir, libraries_dir, version, username, uuid, access_token
+    )
+    log(str(full_command))
 
     # Launch Minecraft
     try:
@@ -82,13 +133,17 @@ def launch_minecraft(
             full_command,
             env=env,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=1,
+            encoding="utf-8",
+            errors="replace",
         )
-        stdout, stderr = process.communicate()
-        print(stdout.decode())
-        print(stderr.decode())
+        # Stream the game's output line by line instead of buffering the whole session
+        forward_output(process.stdout, log)
+        return process.wait()
     except Exception as e:
-        print(f"Failed to launch Minecraft: {e}")
+        log(f"Failed to launch Minecraft: {e}")
+        return None
 
 
 if __name__ == "__main__":
@@ -1,54 +1,130 @@
 import os
-import subprocess
-import threading
+import asyncio
 import queue
-import shutil
-import string
-import random
+import threading
+import webbrowser
 from pathlib import Path
 from textual.app import App, ComposeResult
+from textual.message import Message
+from textual.timer import Timer
 from textual.widgets import Button, Static, Input, Log
 from textual.containers import Horizontal, Vertical
+from download import install_fabric, install_version
+from launch import build_launch_command
+
+# Constants
+APPDATA = os.getenv("APPDATA")
+BASE_PATH = Path(APPDATA) / "TuiCraft"
+LIBRARIES_PATH = BASE_PATH / "libraries"
+INSTANCES_PATH = BASE_PATH / "instances"
+ASSETS_PATH = BASE_PATH / "assets"
+LOG_FLUSH_DELAY = 0.05  # Seconds to collect log lines before writing them
+LOG_FLUSH_SIZE = 64 * 1024  # Write immediately once this many characters are waiting
+PIPE_LINE_LIMIT = 1024 * 1024  # Child process lines longer than this are logged in pieces
+ABOUT_URL = "https://github.com/IntelAkaLake/TuiCraft/"
+
+HEADER_ART = r"""
+  _____     _  ___           __ _   
+ |_   _|  _(_)/ __|_ _ __ _ / _| |_ 
+   | || || | | (__| '_/ _` |  _|  _| 
+   |_| \_,_|_|\___|_| \__,_|_|  \__| 
+                                    
+            """
+
+
+def _scan_versions(path: Path) -> list[str]:
+    """Return the names of the version directories under path."""
+    with os.scandir(path) as entries:
+        return [entry.name for entry in entries if entry.is_dir(follow_symlinks=False)]
+
+
+def _resolve(future: asyncio.Future, result, error: Exception | None) -> None:
+    """Complete a future from the job thread unless its waiter was cancelled."""
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class LogLine(Message):
+    """A line of output posted from a worker thread."""
+
+    def __init__(self, text: str) -> None:
+        super().__init__()
+        self.text = text
+
 
 class BorderTitleApp(App[None]):
     CSS = """
+    #header {
+        text-align: left;
+        color: #eae4e0;
+        background: #0d0b09;
+    }
+    #root-container {
+        background: #0d0b09;
+    }
+    #instances-container {
+        width: 70%;
+        height: 100%;
+        border: round #ac9889;
+        border-title-align: left;
+    }
+    #settings-container {
+        width: 30%;
+        height: 100%;
+        border: round #ac9889;
+        border-title-align: left;
+    }
     #instance-input {
-        display: none;
+        border: round #ac9889;
+        background: #0d0b09;
     }
     #logs-container {
+        border: round #ac9889;
+        background: #0d0b09;
+        height: 99%;
+    }
+    #logs-widget {
+        background: black;
+    }
+    Button {
+        background: #0d0b09;
+        border: none;
+        color: white;
+        text-align: left;
+        min-width: 0;
+    }
+    .hidden {
         display: none;
     }
     """
 
+    def __init__(self) -> None:
+        super().__init__()
+        self._log_buffer: list[str] = []
+        self._log_buffer_size = 0
+        self._log_flush_timer: Timer | None = None
+
+        # Ensure directories exist; parents=True creates BASE_PATH along the way
+        for path in (LIBRARIES_PATH, INSTANCES_PATH, ASSETS_PATH):
+            path.mkdir(parents=True, exist_ok=True)
+
+        # One long-lived daemon thread runs the blocking installers in turn, with one
+        # event loop reused by every download. Unlike executor threads it is never
+        # joined, so quitting does not wait for a running install
+        self._jobs: queue.SimpleQueue = queue.SimpleQueue()
+        self._job_loop = asyncio.new_event_loop()
+        threading.Thread(target=self._run_jobs, daemon=True).start()
+
     def compose(self) -> ComposeResult:
         """Compose the UI."""
-        header = Static(
-            r"""
-  _____     _  ___           __ _   
- |_   _|  _(_)/ __|_ _ __ _ / _| |_ 
-   | || || | | (__| '_/ _` |  _|  _| 
-   |_| \_,_|_|\___|_| \__,_|_|  \__| 
-                                    
-            """,
-            id="header",
-        )
-        yield header
-
-        APPDATA = os.getenv("APPDATA")
-        BASE_PATH = Path(APPDATA) / "TuiCraft"
-        LIBRARIES_PATH = BASE_PATH / "libraries"
-        INSTANCES_PATH = BASE_PATH / "instances"
-        ASSETS_PATH = BASE_PATH / "assets"
-        
-        BASE_PATH.mkdir(parents=True, exist_ok=True)
-        LIBRARIES_PATH.mkdir(parents=True, exist_ok=True)
-        INSTANCES_PATH.mkdir(parents=True, exist_ok=True)
-        ASSETS_PATH.mkdir(parents=True, exist_ok=True)
-        
+        yield Static(HEADER_ART, id="header")
+
         # Instances Section
-        available_versions = [
-            folder.name for folder in LIBRARIES_PATH.iterdir() if folder.is_dir()
-        ]
+        available_versions = _scan_versions(LIBRARIES_PATH)
 
         # Create a Vertical container with buttons for each version
         instances_section = Vertical(
@@ -75,6 +151,7 @@ class BorderTitleApp(App[None]):
         yield Input(
             placeholder="Type the Minecraft version and press Enter",
             id="instance-input",
+            classes="hidden",
         )
 
         # Add a Log widget for logs (hidden initially)
@@ -82,130 +159,173 @@ class BorderTitleApp(App[None]):
             Log(id="logs-widget", auto_scroll=True),
             Button("Back to Main", id="back-to-main"),
             id="logs-container",
+            classes="hidden",
         )
         yield logs_section
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
         """Handle button presses."""
         button_id = event.button.id
-        if button_id.startswith("instance-"):
-            version = button_id.replace("instance-", "").replace("_", ".")[:-4]
-            self.launch_instance(version)
-        elif button_id == "setting-instance":
-            self.show_instance_input()
-        elif button_id == "setting-fabric":
-            self.show_logs_section()
-            self.download_fabric()
-        elif button_id == "setting-about":
-            os.system("start \"\" https://github.com/IntelAkaLake/TuiCraft/")
-        elif button_id == "back-to-main":
-            self.show_main_sections()
+        handler = self._handlers.get(button_id)
+        if handler is not None:
+            handler()
+        elif button_id is not None and button_id.startswith("instance-"):
+            version = button_id[len("instance-"):].replace("_", ".")
+            self.run_worker(self.launch_instance(version))
+
+    def _on_fabric(self) -> None:
+        """Show the logs and start the Fabric installer."""
+        self.show_logs_section()
+        self.run_worker(self.download_fabric())
+
+    def _on_about(self) -> None:
+        """Open the project page."""
+        # os.startfile hands the URL straight to the shell on Windows and only exists there
+        if hasattr(os, "startfile"):
+            os.startfile(ABOUT_URL)
+        else:
+            webbrowser.open(ABOUT_URL)
 
     def show_instance_input(self) -> None:
         """Show the instance input field."""
-        input_widget = self.query_one("#instance-input")
-        input_widget.styles.display = "block"
-        input_widget.focus()
+        self._instance_input.remove_class("hidden")
+        self._instance_input.focus()
 
     def show_logs_section(self) -> None:
         """Show the logs section and hide the main sections."""
-        instances = self.query_one("#instances-container", Vertical)
-        settings = self.query_one("#settings-container", Vertical)
-        logs = self.query_one("#logs-container", Vertical)
-        header = self.query_one("#header")
-
-        instances.styles.display = "none"
-        settings.styles.display = "none"
-        header.styles.display = "none"
-        logs.styles.display = "block"
+        for widget in (self._instances_container, self._settings_container, self._header):
+            widget.add_class("hidden")
+        self._logs_container.remove_class("hidden")
 
     def show_main_sections(self) -> None:
         """Show the main sections and hide the logs section."""
-        instances = self.query_one("#instances-container", Vertical)
-        settings = self.query_one("#settings-container", Vertical)
-        logs = self.query_one("#logs-container", Vertical)
-        header = self.query_one("#header")
-
-        logs.styles.display = "none"
-        header.styles.display = "block"
-        instances.styles.display = "block"
-        settings.styles.display = "block"
+        self._logs_container.add_class("hidden")
+        for widget in (self._header, self._instances_container, self._settings_container):
+            widget.remove_class("hidden")
 
     def log_to_widget(self, message: str) -> None:
-        """Log a message to the log widget."""
-        logs_widget = self.query_one("#logs-widget", Log)
-        logs_widget.write_line(message)
-
-    def download_fabric(self) -> None:
+        """Log a message to the log widget, batching lines that arrive close together."""
+        self._log_buffer.append(message)
+        self._log_buffer_size += len(message)
+        if self._log_buffer_size >= LOG_FLUSH_SIZE:
+            self._flush_logs()
+        elif self._log_flush_timer is None:
+            self._log_flush_timer = self.set_timer(LOG_FLUSH_DELAY, self._flush_logs)
+
+    def _flush_logs(self) -> None:
+        """Write all buffered lines to the log widget in a single refresh."""
+        if self._log_flush_timer is not None:
+            self._log_flush_timer.stop()
+            self._log_flush_timer = None
+        if self._log_buffer:
+            self._logs_widget.write_lines(self._log_buffer)
+            self._log_buffer = []
+            self._log_buffer_size = 0
+
+    def clear_logs(self) -> None:
+        """Clear the log widget, dropping any lines not yet written."""
+        if self._log_flush_timer is not None:
+            self._log_flush_timer.stop()
+            self._log_flush_timer = None
+        self._log_buffer = []
+        self._log_buffer_size = 0
+        self._logs_widget.clear()
+
+    def post_log(self, message: str) -> None:
+        """Log a message through the message queue; safe from any thread and never blocks."""
+        self.post_message(LogLine(message))
+
+    def on_log_line(self, event: LogLine) -> None:
+        """Write lines posted by worker threads."""
+        self.log_to_widget(event.text)
+
+    async def _pump(self, stream: asyncio.StreamReader, prefix: str = "") -> None:
+        """Log each line of a child process stream as soon as it arrives."""
+        split = False
+        while True:
+            try:
+                raw = await stream.readuntil(b"\n")
+            except asyncio.IncompleteReadError as e:
+                # The stream ended; log any last line that had no newline
+                if e.partial:
+                    self.log_to_widget(prefix + e.partial.decode("utf-8", "replace").rstrip())
+                return
+            except asyncio.LimitOverrunError as e:
+                # Keep draining an overlong line so the child never blocks on a full pipe
+                raw = await stream.read(e.consumed)
+                self.log_to_widget(prefix + raw.decode("utf-8", "replace").rstrip())
+                split = True
+                continue
+            # Skip the bare newline left over from a line logged in pieces
+            if not (split and raw == b"\n"):
+                self.log_to_widget(prefix + raw.decode("utf-8", "replace").rstrip())
+            split = False
+
+    def _run_jobs(self) -> None:
+        """Run queued blocking calls one at a time and hand each result back to the UI loop."""
+        while True:
+            loop, future, func, args, kwargs = self._jobs.get()
+            try:
+                result, error = func(*args, **kwargs), None
+            except Exception as e:
+                result, error = None, e
+            try:
+                loop.call_soon_threadsafe(_resolve, future, result, error)
+            except RuntimeError:
+                return  # The app has already exited
+
+    async def _run_job(self, func, *args, **kwargs):
+        """Queue a blocking call for the job thread and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._jobs.put((loop, future, func, args, kwargs))
+        return await future
+
+    async def download_fabric(self) -> None:
         """Download the Fabric installer with real-time logging."""
-        APPDATA = os.getenv("APPDATA")
-        BASE_PATH = Path(APPDATA) / "TuiCraft"
-        fabric_installer_path = Path(BASE_PATH) / "fabric-installer.jar"
+        fabric_installer_path = BASE_PATH / "fabric-installer.jar"
 
-        logs_widget = self.query_one("#logs-widget")
-        logs_widget.clear()
+        self.clear_logs()
         self.log_to_widget(f"Starting Fabric download to {fabric_installer_path}...")
 
-        def run_subprocess():
-            try:
-                process = subprocess.Popen(
-                    ["python", str(Path(__file__).parent / "download.py"), "fabric"],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                )
-                for line in iter(process.stdout.readline, ""):
-                    if line:
-                        self.log_to_widget(line.strip())
-                for line in iter(process.stderr.readline, ""):
-                    if line:
-                        self.log_to_widget(f"[ERROR] {line.strip()}")
-                process.stdout.close()
-                process.stderr.close()
-                process.wait()
-                if process.returncode == 0:
-                    self.log_to_widget("Fabric installer successfully ran!")
-                else:
-                    self.log_to_widget(f"Fabric installer failed with code {process.returncode}.")
-            except Exception as e:
-                self.log_to_widget(f"Error during download: {e}")
+        # Posted lines keep their order with the ones the worker thread posts
+        try:
+            if await self._run_job(install_fabric, log=self.post_log):
+                self.post_log("Fabric installer successfully ran!")
+            else:
+                self.post_log("Fabric installer failed.")
+        except Exception as e:
+            self.post_log(f"Error during download: {e}")
 
-        threading.Thread(target=run_subprocess, daemon=True).start()
-
-    def launch_instance(self, version: str) -> None:
+    async def launch_instance(self, version: str) -> None:
         """Launch a Minecraft instance with real-time logging."""
         self.show_logs_section()  # Show the logs section to display launch logs
-        logs_widget = self.query_one("#logs-widget", Log)
-        logs_widget.clear()
+        self.clear_logs()
         self.log_to_widget(f"Launching version: {version}")
 
-        launch_script = Path(__file__).parent / "launch.py"
-
-        def run_launch():
-            try:
-                process = subprocess.Popen(
-                    ["python", str(launch_script), version],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-                for line in iter(process.stdout.readline, ""):
-                    if line.strip():
-                        self.log_to_widget(line.strip())
-                for line in iter(process.stderr.readline, ""):
-                    if line.strip():
-                        self.log_to_widget(f"[ERROR] {line.strip()}")
-                process.stdout.close()
-                process.stderr.close()
-                process.wait()
-                if process.returncode == 0:
-                    self.log_to_widget(f"Instance {version} launched successfully!")
-                else:
-                    self.log_to_widget(f"Instance launch failed with code {process.returncode}.")
-            except Exception as e:
-                self.log_to_widget(f"Error during launch: {e}")
-
-        threading.Thread(target=run_launch, daemon=True).start()
+        try:
+            command, env = build_launch_command(
+                java_path="java",
+                base_dir=BASE_PATH,
+                libraries_dir=LIBRARIES_PATH,
+                version=version,
+            )
+            self.log_to_widget(str(command))
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                env=env,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                limit=PIPE_LINE_LIMIT,
+            )
+            await asyncio.gather(self._pump(process.stdout), self._pump(process.stderr, "[ERROR] "))
+            await process.wait()
+            if process.returncode == 0:
+                self.log_to_widget(f"Instance {version} launched successfully!")
+            else:
+                self.log_to_widget(f"Instance launch failed with code {process.returncode}.")
+        except Exception as e:
+            self.log_to_widget(f"Error during launch: {e}")
 
     def on_input_submitted(self, event: Input.Submitted) -> None:
         """Handle when the user submits the input."""
@@ -213,149 +333,66 @@ class BorderTitleApp(App[None]):
         if input_widget.id == "instance-input":
             version = input_widget.value.strip()
             if version:
-                self.download_instance(version)
-            input_widget.styles.display = "none"
+                self.run_worker(self.download_instance(version))
+            input_widget.add_class("hidden")
 
-    def download_instance(self, version: str) -> None:
+    async def download_instance(self, version: str) -> None:
         """Download a specific Minecraft version."""
         self.show_logs_section()  # Show the logs section to display launch logs
-        logs_widget = self.query_one("#logs-widget", Log)
-        logs_widget.clear()
+        self.clear_logs()
         self.log_to_widget(f"Downloading instance for version: {version}")
 
-        def enqueue_output(stream, q):
-            """Read lines from a stream and put them in a queue."""
-            for line in iter(stream.readline, ''):
-                q.put(line.strip())
-            stream.close()
-
-        def run_subprocess():
-            try:
-                process = subprocess.Popen(
-                    ["python", str(Path(__file__).parent / "download.py"), version],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True  # Ensure text output
-                )
-
-                # Queues to store stdout and stderr lines
-                stdout_queue = queue.Queue()
-                stderr_queue = queue.Queue()
-
-                # Start threads to read stdout and stderr
-                threading.Thread(target=enqueue_output, args=(process.stdout, stdout_queue), daemon=True).start()
-                threading.Thread(target=enqueue_output, args=(process.stderr, stderr_queue), daemon=True).start()
-
-                # Poll the process for output
-                while True:
-                    try:
-                        stdout_line = stdout_queue.get_nowait()
-                    except queue.Empty:
-                        stdout_line = None
-
-                    try:
-                        stderr_line = stderr_queue.get_nowait()
-                    except queue.Empty:
-                        stderr_line = None
-
-                    if stdout_line:
-                        self.log_to_widget(stdout_line)
-                    if stderr_line:
-                        self.log_to_widget(f"{stderr_line}")
-
-                    # Break the loop when the process finishes
-                    if process.poll() is not None and stdout_queue.empty() and stderr_queue.empty():
-                        break
-
-                if process.returncode == 0:
-                    self.log_to_widget(f"Version {version} downloaded successfully!")
-                    self.call_from_thread(self.refresh_instances)
-                else:
-                    self.log_to_widget(f"Download failed with code {process.returncode}.")
-            except Exception as e:
-                self.log_to_widget(f"Failed to download version {version}: {e}")
-
-        # Run the subprocess in a thread to avoid blocking the UI
-        threading.Thread(target=run_subprocess, daemon=True).start()
-
-    def refresh_instances(self) -> None:
+        # The installer does blocking I/O between awaits, so it runs on the job thread's loop
+        try:
+            if await self._run_job(self._job_loop.run_until_complete, install_version(version, log=self.post_log)):
+                self.post_log(f"Version {version} downloaded successfully!")
+                await self.refresh_instances()
+            else:
+                self.post_log(f"Download of version {version} failed.")
+        except Exception as e:
+            self.post_log(f"Failed to download version {version}: {e}")
+
+    async def refresh_instances(self) -> None:
         """Refresh the instances list by scanning the libraries directory."""
-        APPDATA = os.getenv("APPDATA")
-        BASE_PATH = Path(APPDATA) / "TuiCraft"
-        LIBRARIES_PATH = BASE_PATH / "libraries"
-        
-        for folder in BASE_PATH.iterdir():
-            if folder.is_dir() and "__" in folder.name:
-                shutil.rmtree(folder, ignore_errors=True)
-        instances_section = self.query_one("#instances-container", Vertical)
-        instances_section.remove_children()
-
-        if not LIBRARIES_PATH.exists():
+        instances_section = self._instances_container
+        # Wait for the old buttons to go so the new ones can reuse their IDs
+        await instances_section.remove_children()
+
+        # Scan off the event loop so the UI keeps drawing
+        try:
+            available_versions = await asyncio.to_thread(_scan_versions, LIBRARIES_PATH)
+        except FileNotFoundError:
             self.log_to_widget(f"Library path does not exist: {LIBRARIES_PATH}")
             return
 
-        available_versions = [
-            folder.name for folder in LIBRARIES_PATH.iterdir() if folder.is_dir()
-        ]
-        
-        characters = string.ascii_letters + string.digits  # All letters (upper and lower case) and digits
-
-        for version in available_versions:
-            button = Button(version, id=f"instance-{version.replace('.', '_')}__{''.join(random.choices(characters, k=2))}")
-            instances_section.mount(button)
-            
-        for button in self.query(Button):
-            button.styles.background = "#0d0b09"
-            button.styles.border = "none"
-            button.styles.color = "white"
-            button.styles.text_align = "left"
-            button.styles.min_width = 0
+        buttons = [Button(version, id=f"instance-{version.replace('.', '_')}") for version in available_versions]
+        await instances_section.mount(*buttons)
+
         self.log_to_widget("Instances refreshed.")
 
     def on_mount(self) -> None:
         """Styling and initial setup."""
-        header = self.query_one("#header")
-        header.styles.text_align = "left"
-        header.styles.color = "#eae4e0"
-        header.styles.background = "#0d0b09"
-
-        root = self.query_one("#root-container")
-        root.styles.background = "#0d0b09"
-
-        instances = self.query_one("#instances-container")
-        instances.styles.width = "70%"
-        instances.styles.height = "100%"
-        instances.styles.border = ("round", "#ac9889")
-        instances.border_title = "Instances"
-        instances.styles.border_title_align = "left"
-
-        settings = self.query_one("#settings-container")
-        settings.styles.width = "30%"
-        settings.styles.height = "100%"
-        settings.styles.border = ("round", "#ac9889")
-        settings.border_title = "Settings"
-        settings.styles.border_title_align = "left"
-
-        uinput = self.query_one("#instance-input")
-        uinput.styles.border = ("round", "#ac9889")
-        uinput.border_title = "New Instance"
-        uinput.styles.background = "#0d0b09"
-
-        logs_section = self.query_one("#logs-container")
-        logs_section.styles.border = ("round", "#ac9889")
-        logs_section.border_title = "Logs"
-        logs_section.styles.background = "#0d0b09"
-        logs_section.styles.height = "99%"
-
-        log = self.query_one("#logs-widget")
-        log.styles.background = "black"
-
-        for button in self.query(Button):
-            button.styles.background = "#0d0b09"
-            button.styles.border = "none"
-            button.styles.color = "white"
-            button.styles.text_align = "left"
-            button.styles.min_width = 0
+        # Look up the widgets the handlers use once, instead of on every call
+        self._header = self.query_one("#header", Static)
+        self._instances_container = self.query_one("#instances-container", Vertical)
+        self._settings_container = self.query_one("#settings-container", Vertical)
+        self._logs_container = self.query_one("#logs-container", Vertical)
+        self._logs_widget = self.query_one("#logs-widget", Log)
+        self._instance_input = self.query_one("#instance-input", Input)
+
+        # Fixed buttons map straight to their handlers
+        self._handlers = {
+            "setting-instance": self.show_instance_input,
+            "setting-fabric": self._on_fabric,
+            "setting-about": self._on_about,
+            "back-to-main": self.show_main_sections,
+        }
+
+        # Border titles are widget attributes; everything else is styled in CSS
+        self._instances_container.border_title = "Instances"
+        self._settings_container.border_title = "Settings"
+        self._instance_input.border_title = "New Instance"
+        self._logs_container.border_title = "Logs"
 
 if __name__ == "__main__":
     app = BorderTitleApp()